@@ -0,0 +1,66 @@
+"""SoA 포맷 토크나이저 로더.
+
+train_model.py의 save_tokenizer_soa가 남긴 words.npy + scores_<type>.npy에서
+LTokenizer를 재구성한다. 어휘는 한 번만 저장되므로 타입별 .joblib 세 개보다
+디스크/메모리 사용이 훨씬 작다.
+"""
+import os
+import numpy as np
+from soynlp.tokenizer import LTokenizer
+
+try:
+    import marisa_trie
+    _HAS_MARISA = True
+except ImportError:
+    _HAS_MARISA = False
+
+
+class ColumnLTokenizer(LTokenizer):
+    """스코어 매핑만 바꿔 끼워 재사용할 수 있는 LTokenizer
+
+    어휘는 공유 words 리스트 하나고 타입 간 차이는 스코어 컬럼뿐이므로,
+    set_scores로 매핑 포인터만 교체하면 인스턴스를 다시 만들 필요가 없다.
+    저장된 토크나이저를 언피클하는 쪽에서도 import할 수 있게 여기에 둔다.
+    """
+    def set_scores(self, scores) -> None:
+        self.scores = scores
+
+
+class TrieScores:
+    """marisa_trie.RecordTrie('<f')를 LTokenizer가 기대하는 dict 인터페이스로 노출
+
+    PyObject 키/값 + 해시 슬롯 대신 연속 메모리 trie라 상주 메모리가 4~10배 작다.
+    스코어가 float32로 반올림되고 언피클 시 marisa_trie가 필요하므로
+    저장(피클)용이 아니라 런타임 전용이다 — load_tokenizer(compact=True)로만 쓴다.
+    """
+    def __init__(self, trie):
+        self._trie = trie
+
+    def __getitem__(self, key):
+        return self._trie[key][0][0]
+
+    def __contains__(self, key):
+        return key in self._trie
+
+    def __len__(self):
+        return len(self._trie)
+
+    def get(self, key, default=0.0):
+        hits = self._trie.get(key)
+        return hits[0][0] if hits else default
+
+
+def load_tokenizer(model_dir: str = './resources', score_type: str = 'cohesion',
+                   compact: bool = False) -> LTokenizer:
+    """공유 어휘 + 해당 타입 스코어 컬럼으로 LTokenizer 재구성
+
+    compact=True이고 marisa_trie가 설치돼 있으면 dict 대신 trie 기반
+    스코어 맵을 쓴다 (메모리 절감, float32 정밀도).
+    """
+    words = np.load(os.path.join(model_dir, 'words.npy'), allow_pickle=True).tolist()
+    scores = np.load(os.path.join(model_dir, f'scores_{score_type}.npy'))
+    if compact and _HAS_MARISA:
+        mapping = TrieScores(marisa_trie.RecordTrie('<f', zip(words, ((float(s),) for s in scores))))
+    else:
+        mapping = dict(zip(words, scores.tolist()))
+    return ColumnLTokenizer(scores=mapping)
@@ -1,11 +1,19 @@
 import streamlit as st
-import re 
+import re
+import html
 import urllib.request
 import urllib.parse
 import requests as rq
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from lxml import html as lxml_html
+import hashlib
+import heapq
 import json
 import pickle
+import joblib
+from collections import Counter
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from PIL import Image
@@ -14,27 +22,163 @@ import matplotlib.pyplot as plt
 from streamlit_lottie import st_lottie
 import platform
 import os
+import time
 import urllib.error
 from typing import Dict, List, Optional, Tuple
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    _HAS_PYARROW = True
+except ImportError:
+    _HAS_PYARROW = False
+
 # --- [1. 설정 및 데이터 관리 함수] ---
 st.set_page_config(page_title="🔍 뉴스 키워드 시각화")
 
-STOPWORDS_FILE = './resources/user_stopwords.json'
+STOPWORDS_FILE = './resources/user_stopwords.pkl'
+STOPWORDS_JSON_LEGACY = './resources/user_stopwords.json'
+TOKENIZER_PATH = './resources/my_tokenizer3.model'
+TOKENIZER_JOBLIB_PATH = './resources/my_tokenizer3.joblib'
+
+def _load_tokenizer():
+    # joblib 사본이 있으면 mmap으로 로드: 대형 배열을 OS 페이지 캐시로 공유해 cold start 단축
+    if os.path.exists(TOKENIZER_JOBLIB_PATH):
+        return joblib.load(TOKENIZER_JOBLIB_PATH, mmap_mode='r')
+    with open(TOKENIZER_PATH, 'rb') as f:
+        tokenizer = pickle.load(f)
+    try:
+        # 다음 cold start부터는 mmap 경로를 타도록 joblib 사본을 한 번 만들어 둠.
+        # cold start 시 워커 여럿이 동시에 이 분기를 타므로 임시파일에 쓴 뒤
+        # os.replace로 원자적 교체 (부분 파일이 보이면 이후 mmap 로드가 전부 깨짐)
+        tmp_path = f'{TOKENIZER_JOBLIB_PATH}.tmp.{os.getpid()}'
+        joblib.dump(tokenizer, tmp_path)
+        os.replace(tmp_path, TOKENIZER_JOBLIB_PATH)
+    except: pass
+    return tokenizer
+
+# 기사 본문 동시 수집 스레드 수 (I/O-bound라 서버 한도 내에서 병렬화)
+FETCH_WORKERS = 16
+
+# --- 토큰화 워커 (CPU-bound라 프로세스 풀로 분산; fork 기반이라 모듈 수준 정의 필요) ---
+_WORKER_TOKENIZER = None
+_WORKER_STOPS = frozenset()
+_WORKER_STOP_ARR = None
+
+def _tokenize_worker_init(stopwords):
+    global _WORKER_TOKENIZER, _WORKER_STOPS, _WORKER_STOP_ARR
+    _WORKER_TOKENIZER = _load_tokenizer()
+    _WORKER_STOPS = stopwords
+    # Arrow value_set은 기사마다가 아니라 워커당 한 번만 변환
+    _WORKER_STOP_ARR = pa.array(sorted(stopwords)) if (_HAS_PYARROW and stopwords) else None
+
+def _filter_tokens(tokens, stopwords, stop_arr=None):
+    # 길이 2~10 + 불용어 제외. pyarrow가 있으면 C++ 벡터 커널로 처리
+    if not _HAS_PYARROW:
+        return [t for t in tokens if 2 <= len(t) <= 10 and t not in stopwords]
+    arr = pa.array(tokens, type=pa.string())
+    lens = pc.utf8_length(arr)
+    mask = pc.and_(pc.greater_equal(lens, 2), pc.less_equal(lens, 10))
+    if stop_arr is None and stopwords:
+        stop_arr = pa.array(sorted(stopwords))
+    if stop_arr is not None:
+        mask = pc.and_(mask, pc.invert(pc.is_in(arr, value_set=stop_arr)))
+    return arr.filter(mask).to_pylist()
+
+@lru_cache(maxsize=4096)
+def _tokenize_cached(text_hash, _text):
+    # 같은 본문(신디케이트 기사, 보일러플레이트)은 세션 내 재토큰화 생략
+    return tuple(t[0] for t in _WORKER_TOKENIZER.tokenize(_text, flatten=False))
+
+def _tokenize_worker(text):
+    h = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    tokens = _tokenize_cached(h, text)
+    return Counter(_filter_tokens(list(tokens), _WORKER_STOPS, _WORKER_STOP_ARR))
+
+@st.cache_resource
+def get_session():
+    session = rq.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+    session.headers.update({'User-Agent': 'Mozilla/5.0'})
+    return session
+
+# URL 기준 디스크 캐시: 같은 기사를 다시 분석할 때 수집+파싱을 건너뜀
+_ARTICLE_MEMORY = joblib.Memory('./resources/article_cache', verbose=0)
+
+@_ARTICLE_MEMORY.cache(ignore=['session'])
+def fetch_article_text(url, session):
+    # 네트워크 오류는 캐시 밖(fetch 래퍼)에서 처리: 여기서 삼키면 None이 영구 캐시됨
+    res = session.get(url, timeout=5)
+    # bs4 트리 생성 없이 lxml로 본문 노드만 바로 추출 (#dic_area, 구형은 .news_end)
+    # res.text 대신 bytes를 넘겨 charset-normalizer 감지를 생략 (lxml이 meta에서 인코딩 판별)
+    tree = lxml_html.fromstring(res.content)
+    node = tree.get_element_by_id('dic_area', None)
+    if node is None:
+        old_nodes = tree.find_class('news_end')
+        node = old_nodes[0] if old_nodes else None
+    if node is None:
+        return None
+    return cleanText(node.text_content())
+
+@st.cache_data(show_spinner=False)
+def _load_user_stopwords_cached(mtime):
+    # mtime이 캐시 키: 파일이 바뀌면 자동으로 무효화, 안 바뀌면 재파싱 없음
+    try:
+        with open(STOPWORDS_FILE, 'rb') as f:
+            return frozenset(pickle.load(f))
+    except: return frozenset()
 
 def load_user_stopwords():
-    if os.path.exists(STOPWORDS_FILE):
+    if not os.path.exists(STOPWORDS_FILE) and os.path.exists(STOPWORDS_JSON_LEGACY):
+        # 기존 JSON 저장본을 pickle 포맷으로 1회 이전
         try:
-            with open(STOPWORDS_FILE, 'r', encoding='utf-8') as f:
-                return set(json.load(f))
-        except: return set()
-    return set()
+            with open(STOPWORDS_JSON_LEGACY, 'r', encoding='utf-8') as f:
+                save_user_stopwords(set(json.load(f)))
+        except: pass
+    if os.path.exists(STOPWORDS_FILE):
+        return _load_user_stopwords_cached(os.path.getmtime(STOPWORDS_FILE))
+    return frozenset()
 
 def save_user_stopwords(stopwords_set):
     if not os.path.exists('./resources'):
         os.makedirs('./resources')
-    with open(STOPWORDS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(list(sorted(stopwords_set)), f, ensure_ascii=False)
+    with open(STOPWORDS_FILE, 'wb') as f:
+        pickle.dump(frozenset(stopwords_set), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+# 키워드별 분석 결과를 디스크에 보관 → 새 세션/새로고침에서도 재분석 생략
+ANALYSES_DIR = './resources/analyses'
+
+def _analysis_cache_path(keyword, m_amount, n_amount):
+    # 날짜를 키에 포함해 하루 단위로 자동 무효화 (뉴스 검색이라 영구 캐시는 회귀)
+    today = time.strftime('%Y-%m-%d')
+    key = hashlib.md5(f'{keyword}|{m_amount}|{n_amount}|{today}'.encode('utf-8')).hexdigest()
+    return os.path.join(ANALYSES_DIR, f'{key}.pkl.gz')
+
+def load_saved_analysis(keyword, m_amount, n_amount):
+    path = _analysis_cache_path(keyword, m_amount, n_amount)
+    if os.path.exists(path):
+        try:
+            return joblib.load(path)
+        except: return None
+    return None
+
+def save_analysis(keyword, m_amount, n_amount, payload):
+    os.makedirs(ANALYSES_DIR, exist_ok=True)
+    # 키에 날짜가 들어가 전날 파일은 더 이상 조회되지 않음 — 하루 지난 항목은 정리
+    cutoff = time.time() - 86400
+    for name in os.listdir(ANALYSES_DIR):
+        path = os.path.join(ANALYSES_DIR, name)
+        try:
+            if name.endswith('.pkl.gz') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+    joblib.dump(payload, _analysis_cache_path(keyword, m_amount, n_amount), compress=3)
+
+def rank_keywords(stats, n):
+    # 전체 어휘를 정렬/복사하지 않고 필요한 시점에 상위 n개만 추출
+    # 1순위 기사 발생 수, 2순위 총 언급 횟수
+    return heapq.nlargest(n, stats.items(), key=lambda x: (x[1][0], x[1][1]))
 
 def get_naver_news(keyword, display, start):
     client_id = st.session_state.get('client_id')
@@ -61,22 +205,17 @@ def get_naver_news(keyword, display, start):
         st.error(f"❌ 연결 오류: {str(e)}")
         return None
 
+# 본문 정제용 패턴은 호출마다 컴파일하지 않도록 모듈 수준에서 한 번만 컴파일
+_RE_CLEAN = re.compile(r'[\d\W]|[a-zA-Z]+')
+_RE_WS = re.compile(r'\s+')
+
 def cleanText(text):
-    text = re.sub(r'\d|[a-zA-Z]|\W',' ', text)
-    return re.sub(r'\s+',' ', text)
+    return _RE_WS.sub(' ', _RE_CLEAN.sub(' ', text))
 
-def cleanHtml(text):
-    text = re.sub(r'<[^>]+>', '', text)
-    for ent, char in [('&quot;', '"'), ('&apos;', "'"), ('&amp;', '&'), ('&lt;', '<'), ('&gt;', '>')]:
-        text = text.replace(ent, char)
-    return text
+_TAG_RE = re.compile(r'<[^>]+>')
 
-@st.cache_resource
-def getTokenizer():
-    try:
-        with open('./resources/my_tokenizer3.model','rb') as f:
-            return pickle.load(f)
-    except: return None
+def cleanHtml(text):
+    return html.unescape(_TAG_RE.sub('', text))
 
 def get_font_path() -> Optional[str]:
     # 1. 먼저 resources 폴더에 직접 업로드한 폰트가 있는지 확인
@@ -186,64 +325,105 @@ else:
             m_amount = st.slider('수집 기사 수 (m)', 100, 800, 100, 100)
         with sfcol3:
             n_amount = st.slider('기사당 수집할 핵심 단어 수 (n)', 30, 300, 50)
-        
+
+        force_refresh = st.checkbox("🔄 저장된 결과 무시하고 새로 분석")
+
         if st.form_submit_button("분석 시작"):
             if search_keyword:
-                my_tokenizer = getTokenizer()
-                items = []
-                for i in range(m_amount // 100):
-                    items.extend(get_naver_news(search_keyword, 100, (i*100)+1))
+                saved = None if force_refresh else load_saved_analysis(search_keyword, m_amount, n_amount)
+                if saved is not None:
+                    st.session_state.update({
+                        'total_stats': saved['total_stats'],
+                        'current_keyword': search_keyword,
+                        'current_n': n_amount,
+                        'news_items': saved['news_items'],
+                        'analysis_step': True
+                    })
+                    if 'display_dict' in st.session_state: del st.session_state['display_dict']
+                    st.toast("저장된 분석 결과를 불러왔습니다.")
+                else:
+                    items = []
+                    for i in range(m_amount // 100):
+                        items.extend(get_naver_news(search_keyword, 100, (i*100)+1))
                 
-                if items:
-                    total_stats = {} # {단어: [기사발생수, 총언급횟수]}
-                    news_data_list = []
-                    saved_stops = load_user_stopwords()
-                    pbar = st.progress(0)
-                    status_text = st.empty()
+                    if items:
+                        keyword_rows = [] # (단어, 기사 내 빈도) 튜플 누적 → 마지막에 한 번에 집계
+                        news_data_list = []
+                        saved_stops = load_user_stopwords()
+                        pbar = st.progress(0)
+                        status_text = st.empty()
                     
-                    for idx, item in enumerate(items):
-                        news_data_list.append({'날짜': item['pubDate'], '제목': cleanHtml(item['title']), '링크': item['link']})
-                        if 'n.news.naver.com' in item['link']:
+                        for item in items:
+                            news_data_list.append({'날짜': item['pubDate'], '제목': cleanHtml(item['title']), '링크': item['link']})
+
+                        session = get_session()
+
+                        def fetch(link):
                             try:
-                                res = rq.get(item['link'], headers={'User-Agent':'Mozilla/5.0'}, timeout=5)
-                                news_tag = BeautifulSoup(res.text, 'html.parser').select_one('#dic_area')
-                                if news_tag:
-                                    txt = cleanText(news_tag.text)
-                                    tokens = [t[0] for t in my_tokenizer.tokenize(txt, flatten=False)]
-                                    # 1. 단어 추출 및 단어장 필터링
-                                    words = [t for t in tokens if 2 <= len(t) <= 10 and t not in saved_stops]
-                                    if words:
-                                        full_counts = pd.Series(words).value_counts()
-                                        # 2. 상위 n_amount개 선정
-                                        top_n = full_counts.head(n_amount)
-                                        
-                                        # 3. 듀얼 카운팅 (이진 가중치 + 실제 빈도)
-                                        for word, count in top_n.items():
-                                            if word not in total_stats:
-                                                total_stats[word] = [0, 0]
-                                            total_stats[word][0] += 1      # 기사 발생 수 (Binary)
-                                            total_stats[word][1] += count  # 총 언급 횟수 (Raw Frequency)
-                            except: continue
-                        pbar.progress((idx + 1) / len(items))
-                        status_text.text(f"기사 분석 중... ({idx+1}/{len(items)})")
-                    
-                    if total_stats:
-                        # 4. 정렬: 1순위 기사수(x[1][0]), 2순위 총빈도(x[1][1])
-                        sorted_stats = dict(sorted(total_stats.items(), key=lambda x: (x[1][0], x[1][1]), reverse=True))
-                        st.session_state.update({
-                            'total_stats': sorted_stats,
-                            'current_keyword': search_keyword,
-                            'current_n': n_amount,
-                            'news_items': news_data_list,
-                            'analysis_step': True
-                        })
-                        if 'display_dict' in st.session_state: del st.session_state['display_dict']
-                    else: st.error("결과가 없습니다.")
+                                return fetch_article_text(link, session)
+                            except:
+                                return None
+
+                        # 네이버 뉴스 링크만, 중복 URL은 한 번만 수집 (API 결과에 중복 다수)
+                        naver_links = list({it['link'] for it in items if 'n.news.naver.com' in it['link']})
+                        total_fetch = len(naver_links) or 1
+                        # 진행률 갱신은 건당이 아니라 약 50회로 제한 (websocket 렌더 비용 절감)
+                        progress_step = max(1, total_fetch // 50)
+                        done = 0
+                        article_texts = []
+                        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+                            futures = [executor.submit(fetch, link) for link in naver_links]
+                            for future in as_completed(futures):
+                                txt = future.result()
+                                done += 1
+                                if txt:
+                                    article_texts.append(txt)
+                                if done % progress_step == 0 or done == total_fetch:
+                                    pbar.progress(done / total_fetch)
+                                    status_text.text(f"기사 수집 중... ({done}/{total_fetch})")
+
+                        # 수집이 끝난 뒤 전체 본문을 프로세스 풀에서 토큰화+필터+카운트
+                        status_text.text(f"토큰화 중... ({len(article_texts)}개 기사)")
+                        article_counters = []
+                        if not (os.path.exists(TOKENIZER_PATH) or os.path.exists(TOKENIZER_JOBLIB_PATH)):
+                            # 모델이 없으면 워커 initializer가 전부 죽어 BrokenProcessPool로 터짐
+                            st.error(f"토크나이저 모델을 찾을 수 없습니다: {TOKENIZER_PATH}")
+                        else:
+                            try:
+                                with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                                         initializer=_tokenize_worker_init,
+                                                         initargs=(saved_stops,)) as tok_executor:
+                                    article_counters = list(tok_executor.map(_tokenize_worker, article_texts, chunksize=8))
+                            except Exception as e:
+                                st.error(f"토큰화 실패: {e}")
+
+                        for counts in article_counters:
+                            if counts:
+                                # 기사별 상위 n_amount개만 (단어, 빈도) 행으로 누적
+                                keyword_rows.extend(counts.most_common(n_amount))
+
+                        if keyword_rows:
+                            # 3+4. 듀얼 카운팅을 pandas C-groupby 한 번으로 처리 (정렬은 표시 시점에 top-K만)
+                            #      articles = 기사 발생 수 (Binary), total = 총 언급 횟수 (Raw Frequency)
+                            kw_df = pd.DataFrame(keyword_rows, columns=['word', 'count'])
+                            agg = kw_df.groupby('word', sort=False).agg(articles=('count', 'size'), total=('count', 'sum'))
+                            total_stats = {w: [int(a), int(t)] for w, a, t in zip(agg.index, agg['articles'], agg['total'])}
+                            st.session_state.update({
+                                'total_stats': total_stats,
+                                'current_keyword': search_keyword,
+                                'current_n': n_amount,
+                                'news_items': news_data_list,
+                                'analysis_step': True
+                            })
+                            if 'display_dict' in st.session_state: del st.session_state['display_dict']
+                            save_analysis(search_keyword, m_amount, n_amount,
+                                          {'total_stats': total_stats, 'news_items': news_data_list})
+                        else: st.error("결과가 없습니다.")
 
     if st.session_state.get('analysis_step') and 'total_stats' in st.session_state:
         full_dict = st.session_state['total_stats']
         display_limit = st.session_state.get('current_n', 50)
-        top_words = list(full_dict.keys())[:display_limit]
+        top_words = [w for w, _ in rank_keywords(full_dict, display_limit)]
         saved_stops = load_user_stopwords()
 
         st.divider()
@@ -320,11 +500,11 @@ else:
             with c2: 
                 st.write("### 📈 기사수 & 총빈도")
                 # 테이블에는 두 수치를 모두 표시하여 정렬 기준 확인 가능하게 함
-                stat_data = [
-                    {'단어': k, '등장 기사 수': full_dict[k][0], '총 언급 횟수': full_dict[k][1]} 
-                    for k in st.session_state['display_dict'].keys()
-                ]
-                st.dataframe(pd.DataFrame(stat_data), use_container_width=True)
+                # 행별 dict 대신 컬럼 배열로 바로 구성해 dtype 추론을 생략
+                stat_words = list(st.session_state['display_dict'].keys())
+                stat_pairs = np.array([full_dict[w] for w in stat_words], dtype=np.int64).reshape(-1, 2)
+                stat_df = pd.DataFrame({'단어': stat_words, '등장 기사 수': stat_pairs[:, 0], '총 언급 횟수': stat_pairs[:, 1]})
+                st.dataframe(stat_df, use_container_width=True)
             
                 
 
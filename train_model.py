@@ -1,16 +1,49 @@
 import os
-import math
+import gzip
+import hashlib
+import inspect
+import mmap
+import pickle
+import shutil
 import logging
 import logging.handlers
 import urllib.request
 import yaml
 import sys
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 import joblib
-from soynlp import DoublespaceLineCorpus
 from soynlp.word import WordExtractor
 from soynlp.tokenizer import LTokenizer
 
+from loader import ColumnLTokenizer
+
+try:
+    from numba import njit, prange
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+if _NUMBA_AVAILABLE:
+    import math
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _hybrid_kernel(coh, bre, out):
+        for i in prange(coh.size):
+            out[i] = coh[i] * math.exp(bre[i])
+
+# 이 크기 미만 어휘는 JIT 워밍업 비용이 더 커서 NumPy 경로 사용
+_NUMBA_HYBRID_MIN = 50_000
+
+def _hybrid_scores(coh, bre):
+    """cohesion * exp(branching) 융합: 대형 어휘는 numba 병렬 커널, 아니면 NumPy"""
+    if _NUMBA_AVAILABLE and coh.size >= _NUMBA_HYBRID_MIN:
+        out = np.empty_like(coh)
+        _hybrid_kernel(coh, bre, out)
+        return out
+    return coh * np.exp(bre)
+
 # ===== 로깅 설정 (여기부터!) =====
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -32,16 +65,16 @@ logger.addHandler(file_handler)
 
 logger.info("로깅 시스템 시작!")  # 테스트 로그
 # ===== 로깅 끝 =====
-# 로깅 설정
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+
+# 재실행 시 코퍼스 다운로드/학습을 건너뛰기 위한 디스크 캐시
+memory = joblib.Memory('./.cache', verbose=0)
 def load_config(config_path: str = 'config.yaml') -> Dict[str, Any]:
     """YAML config 파일 로드 (강화 버전)"""
     try:
         if os.path.exists(config_path):
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = yaml.safe_load(f)
-                logger.info(f"Config 로드: {config_path}")
+                logger.info("Config 로드: %s", config_path)
                 return config
         else:
             # 기본 config
@@ -52,14 +85,15 @@ def load_config(config_path: str = 'config.yaml') -> Dict[str, Any]:
                 'extractor_params': {
                     'min_frequency': 100,
                     'min_cohesion_forward': 0.05,
-                    'min_right_branching_entropy': 0.0
+                    'min_right_branching_entropy': 0.0,
+                    'n_workers': os.cpu_count()
                 },
                 'tokenizer_types': ['cohesion', 'branching', 'hybrid']
             }
             logger.info("Config 파일 없음, 기본값 사용")
             return default_config
     except Exception as e:
-        logger.error(f"Config 로드 실패: {e}")
+        logger.error("Config 로드 실패: %s", e)
         logger.info("기본 config 사용")
         return {  # 최소 기본값
             'data_url': 'https://raw.githubusercontent.com/lovit/soynlp/master/tutorials/2016-10-20.txt',
@@ -68,88 +102,224 @@ def load_config(config_path: str = 'config.yaml') -> Dict[str, Any]:
             'extractor_params': {'min_frequency': 100},
             'tokenizer_types': ['cohesion']
         }
+def _sha256_file(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    """대용량 파일 스트리밍 해시 (8 MiB 청크)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _remote_content_length(url: str) -> int:
+    """HEAD 요청으로 원격 파일 크기 조회 (실패 시 -1)"""
+    try:
+        req = urllib.request.Request(url, method='HEAD')
+        with urllib.request.urlopen(req) as res:
+            return int(res.headers.get('Content-Length') or -1)
+    except Exception:
+        return -1
+
 def download_data(url: str, filename: str) -> None:
-    """데이터 다운로드 with 에러 핸들링"""
+    """데이터 다운로드 with 에러 핸들링 (크기+해시 사이드카 일치 시 생략)"""
     try:
-        os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else '.', exist_ok=True)
-        urllib.request.urlretrieve(url, filename)
-        logger.info(f"데이터 다운로드 완료: {filename}")
+        sidecar = filename + '.sha256'
+        if os.path.exists(filename) and os.path.exists(sidecar):
+            remote_size = _remote_content_length(url)
+            size_ok = remote_size in (-1, os.path.getsize(filename))
+            if size_ok:
+                with open(sidecar, 'r', encoding='utf-8') as f:
+                    if f.read().strip() == _sha256_file(filename):
+                        logger.info("데이터 파일 검증 완료, 다운로드 생략: %s", filename)
+                        return
+        # gzip 전송을 요청하고 8 MiB 청크로 바로 목적지에 스트리밍 (urlretrieve의 임시파일 복사 제거)
+        req = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+        with urllib.request.urlopen(req) as res, open(filename, 'wb') as out:
+            src = gzip.GzipFile(fileobj=res) if res.headers.get('Content-Encoding') == 'gzip' else res
+            shutil.copyfileobj(src, out, length=8 * 1024 * 1024)
+        with open(sidecar, 'w', encoding='utf-8') as f:
+            f.write(_sha256_file(filename))
+        logger.info("데이터 다운로드 완료: %s", filename)
     except Exception as e:
-        logger.error(f"데이터 다운로드 실패: {e}")
+        logger.error("데이터 다운로드 실패: %s", e)
         raise
 
+class MmapLineCorpus:
+    """mmap 기반 라인 코퍼스: 파일 전체를 str로 올리지 않고 라인 단위 lazy 디코드
+
+    DoublespaceLineCorpus(iter_sent=False)와 같은 __iter__/__len__ 인터페이스라
+    WordExtractor.train에 그대로 넣을 수 있다. 라인 수는 첫 요청 때 세서 캐시.
+    """
+    def __init__(self, path: str):
+        self._f = open(path, 'rb')
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._len = None
+
+    def __iter__(self):
+        self._mm.seek(0)
+        for line in iter(self._mm.readline, b''):
+            yield line.decode('utf-8', errors='ignore').strip()
+
+    def __len__(self):
+        if self._len is None:
+            self._mm.seek(0)
+            count = 0
+            while self._mm.readline():
+                count += 1
+            self._len = count
+        return self._len
+
+def _supports_n_workers(func) -> bool:
+    """설치된 soynlp가 멀티프로세스 학습(n_workers)을 지원하는지 확인"""
+    try:
+        return 'n_workers' in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
 def train_extractor(corpus_file: str, params: Dict[str, Any]) -> WordExtractor:
-    """WordExtractor 학습"""
+    """WordExtractor 학습 (지원 시 n_workers 프로세스로 병렬 학습)"""
     try:
-        corpus = DoublespaceLineCorpus(corpus_file)
-        logger.info(f"코퍼스 로드: {len(corpus)} 문서")
-        
+        n_workers = params.get('n_workers') or os.cpu_count()
+        corpus = MmapLineCorpus(corpus_file)
+        logger.info("코퍼스 로드: %d 문서", len(corpus))
+
         extractor = WordExtractor(
             min_frequency=params['min_frequency'],
             min_cohesion_forward=params['min_cohesion_forward'],
             min_right_branching_entropy=params['min_right_branching_entropy']
         )
-        extractor.train(corpus)
+        if _supports_n_workers(extractor.train):
+            extractor.train(corpus, n_workers=n_workers)
+        else:
+            logger.info("설치된 soynlp가 n_workers 미지원 — 단일 프로세스로 학습")
+            extractor.train(corpus)
         logger.info("WordExtractor 학습 완료")
         return extractor
     except Exception as e:
-        logger.error(f"학습 실패: {e}")
+        logger.error("학습 실패: %s", e)
         raise
 
-def create_scores(word_score_table: Dict[str, Any], score_type: str) -> Dict[str, float]:
-    """다양한 스코어 계산"""
-    scores = {}
-    for word, score in word_score_table.items():
-        if score_type == 'cohesion':
-            scores[word] = score.cohesion_forward
-        elif score_type == 'branching':
-            scores[word] = score.right_branching_entropy
-        elif score_type == 'hybrid':
-            cohesion = score.cohesion_forward
-            branching = math.exp(score.right_branching_entropy)  # 지수 가중치
-            scores[word] = cohesion * branching
-        else:
-            raise ValueError(f"Unknown score_type: {score_type}")
-    logger.info(f"{score_type} 스코어 테이블 생성: {len(scores)} 단어")
+def extract_scores(extractor: WordExtractor, n_workers: int) -> Dict[str, Any]:
+    """word score 테이블 추출 (지원 시 병렬)"""
+    if _supports_n_workers(extractor.extract):
+        return extractor.extract(n_workers=n_workers)
+    return extractor.extract()
+
+@memory.cache(ignore=['n_workers'])
+def _train_and_extract(corpus_file: str, file_sig: tuple, params_items: tuple, n_workers: int) -> Dict[str, Any]:
+    """(코퍼스 시그니처, 파라미터) 키로 디스크 캐시되는 학습+추출"""
+    params = dict(params_items)
+    params['n_workers'] = n_workers
+    extractor = train_extractor(corpus_file, params)
+    return extract_scores(extractor, n_workers)
+
+def train_and_extract_cached(corpus_file: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """코퍼스 파일(mtime, size)과 파라미터가 같으면 캐시된 word score 테이블 반환
+
+    n_workers는 결과에 영향이 없으므로 캐시 키에서 제외한다.
+    """
+    stat = os.stat(corpus_file)
+    key_params = tuple(sorted((k, v) for k, v in params.items() if k != 'n_workers'))
+    n_workers = params.get('n_workers') or os.cpu_count()
+    return _train_and_extract(corpus_file, (stat.st_mtime, stat.st_size), key_params, n_workers)
+
+# 같은 테이블 객체에 대한 재변환 방지용 1칸 메모
+# (키로 dict 자체를 들고 있어 살아있는 동안 id 재사용이 불가능하다)
+_PREPARE_WST_CACHE = {'key': None, 'value': None}
+
+def _prepare_wst(word_score_table: Dict[str, Any]):
+    """word score 테이블을 (단어 리스트, cohesion/branching float64 배열)로 1회 변환"""
+    if _PREPARE_WST_CACHE['key'] is word_score_table:
+        return _PREPARE_WST_CACHE['value']
+    words = list(word_score_table)
+    n = len(words)
+    coh = np.fromiter((s.cohesion_forward for s in word_score_table.values()), dtype=np.float64, count=n)
+    bre = np.fromiter((s.right_branching_entropy for s in word_score_table.values()), dtype=np.float64, count=n)
+    assert len(words) == coh.size == bre.size
+    _PREPARE_WST_CACHE['key'] = word_score_table
+    _PREPARE_WST_CACHE['value'] = (words, coh, bre)
+    return words, coh, bre
+
+def build_score_columns(word_score_table: Dict[str, Any]):
+    """SoA 레이아웃: 단어 리스트 하나 + 타입별 float64 스코어 컬럼 (어휘 중복 보관 방지)"""
+    words, coh, bre = _prepare_wst(word_score_table)
+    score_cols = {
+        'cohesion': coh,
+        'branching': bre,
+        'hybrid': _hybrid_scores(coh, bre)  # 지수 가중치
+    }
+    return words, score_cols
+
+def create_scores(words: list, score_cols: Dict[str, np.ndarray], score_type: str) -> Dict[str, float]:
+    """해당 타입의 스코어 컬럼을 LTokenizer용 dict로 구체화 (사용 직전에만)
+
+    저장용이라 일반 dict(float64)를 쓴다. 런타임 메모리를 줄이려면
+    loader.load_tokenizer(compact=True)의 trie 경로 참고.
+    """
+    if score_type not in score_cols:
+        raise ValueError(f"Unknown score_type: {score_type}")
+    scores = dict(zip(words, score_cols[score_type].tolist()))
+    logger.info("%s 스코어 테이블 생성: %d 단어", score_type, len(scores))
     return scores
 
 def save_tokenizer(tokenizer: LTokenizer, filepath: str) -> None:
-    """joblib으로 토크나이저 저장"""
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    joblib.dump(tokenizer, filepath)
-    logger.info(f"토크나이저 저장: {filepath}")
+    """joblib으로 토크나이저 저장 (lz4 압축 + pickle protocol 5, lz4 없으면 zlib)"""
+    try:
+        joblib.dump(tokenizer, filepath, compress=('lz4', 3), protocol=pickle.HIGHEST_PROTOCOL)
+    except (ValueError, ModuleNotFoundError):
+        joblib.dump(tokenizer, filepath, compress=3, protocol=pickle.HIGHEST_PROTOCOL)
+    logger.info("토크나이저 저장: %s", filepath)
+
+def save_tokenizer_soa(words: list, score_cols: Dict[str, np.ndarray], model_dir: str) -> None:
+    """어휘는 words.npy 하나로, 타입별 스코어는 float32 컬럼으로 저장 (어휘 3중 저장 방지)
+
+    LTokenizer는 스코어의 상대 크기만 비교하므로 float32로 줄여도 무손실.
+    재구성은 loader.load_tokenizer 참고.
+    """
+    np.save(os.path.join(model_dir, 'words.npy'), np.array(words, dtype=object), allow_pickle=True)
+    for t_type, col in score_cols.items():
+        np.save(os.path.join(model_dir, f'scores_{t_type}.npy'), col.astype(np.float32))
+    logger.info("SoA 토크나이저 저장: %s (words + %d개 score 컬럼)", model_dir, len(score_cols))
 
 def test_tokenizer(tokenizer: LTokenizer, test_sentences: list) -> None:
-    """토크나이저 테스트"""
-    logger.info("토크나이저 테스트:")
-    for sent in test_sentences:
-        tokens = tokenizer.tokenize(sent)
-        logger.info(f"입력: {sent} -> 출력: {tokens}")
+    """토크나이저 테스트 (순수 진단용이라 INFO 비활성 시 토큰화 자체를 생략)"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    # 문장별 호출+로그 대신 C-level map 한 번 + 로그 플러시 한 번
+    tokens_list = list(map(tokenizer.tokenize, test_sentences))
+    logger.info("토크나이저 테스트 결과:\n%s",
+                "\n".join(f"  입력: {s} -> 출력: {t}" for s, t in zip(test_sentences, tokens_list)))
 
 def main():
     config = load_config()
-    
+
+    # 출력/데이터 디렉터리는 저장 루프 밖에서 한 번만 생성
+    os.makedirs(config['model_dir'], exist_ok=True)
+    os.makedirs(os.path.dirname(config['data_file']) or '.', exist_ok=True)
+
     # 1. 데이터 다운로드
     download_data(config['data_url'], config['data_file'])
     
-    # 2. extractor 학습
-    extractor = train_extractor(config['data_file'], config['extractor_params'])
-    word_score_table = extractor.extract()
+    # 2. extractor 학습 (코퍼스+파라미터가 같으면 디스크 캐시 재사용)
+    word_score_table = train_and_extract_cached(config['data_file'], config['extractor_params'])
     
     # 3. 토크나이저 생성 및 저장
     test_sentences = ["한국어토크나이저테스트입니다.", "신조어및복합어처리가중요합니다."]
     
-    for t_type in config['tokenizer_types']:
-        scores = create_scores(word_score_table, t_type)
-        tokenizer = LTokenizer(scores=scores)
-        
-        # 테스트
+    words, score_cols = build_score_columns(word_score_table)
+
+    # 어휘 공유형 SoA 포맷도 함께 저장 (loader.load_tokenizer로 재구성)
+    save_tokenizer_soa(words, score_cols, config['model_dir'])
+
+    def _build_one(t_type: str) -> None:
+        # 타입별 빌드는 서로 독립: 스코어 dict 생성 + 테스트 + 저장(I/O-bound)
+        scores = create_scores(words, score_cols, t_type)
+        tokenizer = ColumnLTokenizer(scores=scores)
         test_tokenizer(tokenizer, test_sentences)
-        
-        # 저장
-        filename = f"my_tokenizer_{t_type}.joblib"
-        filepath = os.path.join(config['model_dir'], filename)
+        filepath = os.path.join(config['model_dir'], f"my_tokenizer_{t_type}.joblib")
         save_tokenizer(tokenizer, filepath)
 
+    with ThreadPoolExecutor(max_workers=len(config['tokenizer_types'])) as executor:
+        list(executor.map(_build_one, config['tokenizer_types']))
+
 if __name__ == "__main__":
     main()